@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import warnings
+
 import setuptools
 
 from tftest import __version__
@@ -20,6 +23,16 @@ from tftest import __version__
 with open("README.md", "r") as fh:
   long_description = fh.read()
 
+# optional compiled build, the pure Python module is always shipped as well
+ext_modules = []
+if os.environ.get('TFTEST_CYTHON'):
+  try:
+    from Cython.Build import cythonize
+  except ImportError:
+    warnings.warn('TFTEST_CYTHON is set but Cython is not installed, skipping')
+  else:
+    ext_modules = cythonize(['tftest.py'], language_level=3)
+
 
 setuptools.setup(
     name="tftest",
@@ -31,6 +44,11 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/GoogleCloudPlatform/terraform-python-testing-helper",
     py_modules=['tftest'],
+    extras_require={
+        'gcs': ['google-cloud-storage'],
+        'orjson': ['orjson'],
+    },
+    ext_modules=ext_modules,
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: Apache Software License",
@@ -13,9 +13,33 @@
 # limitations under the License.
 
 import os
+import sys
 import pytest
 
 
 @pytest.fixture(scope='session')
 def fixtures_dir():
   return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+_STUB_BINARY = '''#!{python}
+import json, os, sys
+if sys.argv[1] == 'env':
+  print(json.dumps({{k: os.environ.get(k) for k in sys.argv[2:]}}))
+elif sys.argv[1] == 'fail':
+  print('bad')
+  print('Error: failed', file=sys.stderr)
+  sys.exit(1)
+else:
+  sys.stdout.write('line1\\r\\nline2\\n')
+  sys.stderr.write('warning\\n')
+'''
+
+
+@pytest.fixture
+def stub_binary(tmp_path):
+  "Executable standing in for terraform, driven by its first argument."
+  path = tmp_path / 'terraform'
+  path.write_text(_STUB_BINARY.format(python=sys.executable))
+  path.chmod(0o755)
+  return str(path)
@@ -36,6 +36,8 @@ ARGS_TESTS = (
     ({'json_format': False}, []),
     ({'lock': True}, []),
     ({'lock': False}, ['-lock=false']),
+    ({'parallelism': None}, []),
+    ({'parallelism': 30}, ['-parallelism=30']),
     ({'plugin_dir': ''}, []),
     ({'plugin_dir': 'abc'}, ['-plugin-dir', 'abc']),
     ({'refresh': True}, []),
@@ -120,3 +122,11 @@ def test_var_args():
 def test_targets():
   assert tftest.parse_args(targets=['one', 'two']) == sorted(
       ['-target=one', '-target=two'])
+
+
+def test_args_order():
+  assert tftest.parse_args(tf_var_file='x.tfvars', tf_vars={'a': 1},
+                           targets=['t']) == [
+      '-var', 'a=1', '-target=t', '-var-file=x.tfvars']
+  assert tftest.parse_args(upgrade=True, color=False, auto_approve=True) == [
+      '-auto-approve', '-no-color', '-upgrade']
@@ -196,3 +196,17 @@ def test_use_cache_with_new_tf_content(tf, dummy_tf_filepath):
           f.write(str(uuid.uuid4()))
 
       assert mock_execute_command.call_count == expected_call_count
+
+
+@pytest.mark.parametrize("tf", [True], indirect=True)
+def test_use_cache_in_memory(tf):
+  """
+  Ensures cache entries are kept in memory as serialized data, so that each
+  call gets its own copy of the output
+  """
+  out = tf.output(use_cache=True)
+  assert [type(data) for _, data in tf._cache_memo.values()] == [bytes]
+  cached = tf.output(use_cache=True)
+  assert cached == out and cached is not out
+  cached._raw.clear()
+  assert tf.output(use_cache=True) == out
@@ -0,0 +1,58 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test removal of Terraform working files."
+
+import os
+
+import tftest
+
+
+def _join_removals():
+  for thread in list(tftest._RMTREE_THREADS):
+    thread.join()
+
+
+def test_cleanup_removes_terraform_dir(tmp_path):
+  tfdir = tmp_path / 'module'
+  (tfdir / '.terraform' / 'providers').mkdir(parents=True)
+  (tfdir / '.terraform' / 'providers' / 'provider').write_text('binary')
+  tftest.TerraformTest._cleanup(str(tfdir), [])
+  _join_removals()
+  assert os.listdir(tfdir) == []
+
+
+def test_cleanup_keeps_symlinked_terraform_dir(tmp_path):
+  shared = tmp_path / 'shared'
+  shared.mkdir()
+  (shared / 'provider').write_text('binary')
+  tfdir = tmp_path / 'module'
+  tfdir.mkdir()
+  (tfdir / '.terraform').symlink_to(shared, target_is_directory=True)
+  tftest.TerraformTest._cleanup(str(tfdir), [])
+  _join_removals()
+  assert os.listdir(tfdir) == []
+  assert (shared / 'provider').read_text() == 'binary'
+
+
+def test_setup_sweeps_interrupted_removals(tmp_path, stub_binary):
+  tfdir = tmp_path / 'module'
+  stale = tfdir / 'child' / (tftest._RMTREE_PREFIX + 'stale')
+  (stale / 'providers').mkdir(parents=True)
+  hidden = tfdir / '.hidden' / (tftest._RMTREE_PREFIX + 'kept')
+  hidden.mkdir(parents=True)
+  tf = tftest.TerraformTest(str(tfdir), binary=stub_binary)
+  tf.setup(cleanup_on_exit=False)
+  assert not stale.exists()
+  assert hidden.exists()
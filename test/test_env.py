@@ -0,0 +1,58 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test the environment passed to Terraform commands."
+
+import json
+
+import tftest
+
+
+def command_env(tf, *names):
+  return json.loads(tf.execute_command('env', *names).out)
+
+
+def test_env_inherited(tmp_path, stub_binary, monkeypatch):
+  monkeypatch.setenv('TFTEST_FOO', 'environ')
+  tf = tftest.TerraformTest(str(tmp_path), binary=stub_binary)
+  assert tf._env_override is None
+  assert command_env(tf, 'TFTEST_FOO') == {'TFTEST_FOO': 'environ'}
+
+
+def test_env_updated(tmp_path, stub_binary, monkeypatch):
+  monkeypatch.setenv('TFTEST_FOO', 'environ')
+  tf = tftest.TerraformTest(str(tmp_path), binary=stub_binary)
+  tf.env['TFTEST_FOO'] = 'updated'
+  assert command_env(tf, 'TFTEST_FOO') == {'TFTEST_FOO': 'updated'}
+
+
+def test_env_argument(tmp_path, stub_binary, monkeypatch):
+  monkeypatch.setenv('TFTEST_FOO', 'environ')
+  monkeypatch.setenv('TFTEST_BAR', 'environ')
+  tf = tftest.TerraformTest(str(tmp_path), binary=stub_binary,
+                            env={'TFTEST_FOO': 'argument'})
+  assert command_env(tf, 'TFTEST_FOO', 'TFTEST_BAR') == {
+      'TFTEST_FOO': 'argument', 'TFTEST_BAR': 'environ'}
+
+
+def test_plugin_cache_dir(tmp_path, stub_binary):
+  env = {'TFTEST_FOO': 'argument'}
+  tf = tftest.TerraformTest(str(tmp_path), basedir=str(tmp_path),
+                            binary=stub_binary, env=env,
+                            plugin_cache_dir='plugins')
+  assert env == {'TFTEST_FOO': 'argument'}
+  plugin_cache_dir = tmp_path / 'plugins'
+  assert plugin_cache_dir.is_dir()
+  assert command_env(tf, 'TF_PLUGIN_CACHE_DIR', 'TFTEST_FOO') == {
+      'TF_PLUGIN_CACHE_DIR': str(plugin_cache_dir), 'TFTEST_FOO': 'argument'}
@@ -0,0 +1,53 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test running Terraform commands as asyncio subprocesses."
+
+import asyncio
+
+import pytest
+import tftest
+
+
+@pytest.fixture
+def tf(tmp_path, stub_binary):
+  return tftest.TerraformTest(str(tmp_path), binary=stub_binary)
+
+
+def test_decode(tf):
+  result = asyncio.run(tf.execute_command_async('version'))
+  assert result == tf.execute_command('version')
+  assert result == (0, 'line1\nline2\n', 'warning\n')
+
+
+def test_raw(tf):
+  result = asyncio.run(tf.execute_command_async('version', decode=False))
+  assert result == tf.execute_command('version', decode=False)
+  assert result == (0, b'line1\r\nline2\n', 'warning\n')
+
+
+def test_error(tf):
+  with pytest.raises(tftest.TerraformTestError) as e:
+    asyncio.run(tf.execute_command_async('fail'))
+  assert e.value.errors == ['failed']
+  assert 'bad' in str(e.value)
+
+
+def test_gather(tf):
+
+  async def run():
+    return await asyncio.gather(
+        *(tf.execute_command_async('version') for _ in range(3)))
+
+  assert [r.out for r in asyncio.run(run())] == ['line1\nline2\n'] * 3
@@ -0,0 +1,30 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import patch
+
+import tftest
+
+
+def test_run_parallel(fixtures_dir):
+  tests = [tftest.TerraformTest(tfdir, fixtures_dir)
+           for tfdir in ('plan_no_outputs', 'plan_no_resource_changes')]
+
+  def execute_command(self, cmd, *cmd_args, **kw):
+    return tftest.TerraformCommandOutput(0, self.tfdir, '')
+
+  with patch.object(tftest.TerraformTest, 'execute_command', execute_command):
+    result = tftest.TerraformTest.run_parallel(tests, 'init', max_workers=2)
+  assert result == [t.tfdir for t in tests]
+  assert tftest.TerraformTest.run_parallel([], 'init') == []
@@ -14,6 +14,7 @@
 
 "Test serialization of tftest instances"
 
+import json
 import pytest
 import tftest
 import pickle
@@ -57,3 +58,32 @@ def test_output(tf):
 def test_state_pull(tf):
   expected = tf.state_pull()
   assert_pickle_flow(expected)
+
+
+def cache_roundtrip(obj):
+  return tftest._cache_loads(tftest._cache_dumps(obj))
+
+
+def test_cache_serialization(fixtures_dir):
+  with open('%s/plan_output.json' % fixtures_dir) as fp:
+    plan = tftest.TerraformPlanOutput(json.load(fp))
+  outputs = tftest.TerraformValueDict({'foo': {'value': 'bar'}})
+  for obj in ('init output', plan, outputs, plan._raw):
+    cached = cache_roundtrip(obj)
+    assert isinstance(cached, type(obj))
+    assert str(cached) == str(obj)
+  # other types, eg run-all output lists, are pickled
+  assert cache_roundtrip([outputs])[0]['foo'] == 'bar'
+
+
+def test_command_output_tuple():
+  out = tftest.TerraformCommandOutput(0, b'{}', '')
+  assert out == (0, b'{}', '')
+  assert out[1] == b'{}' and len(out) == 3
+  assert out._replace(out='{}') == (0, '{}', '')
+  assert out._asdict() == {'retcode': 0, 'out': b'{}', 'err': ''}
+  assert hash(out) == hash((0, b'{}', ''))
+  assert pickle.loads(pickle.dumps(out)) == out
+  resource = tftest.TerraformStateResource('k', 'p', 't', {}, [], {})
+  retcode, _, _ = out
+  assert retcode == 0 and resource[0] == 'k' and len(resource) == 6
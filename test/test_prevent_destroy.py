@@ -13,13 +13,26 @@
 # limitations under the License.
 
 "Test init and plan with prevent_destroy lifecycles"
+import glob
 import logging
+import os
+import shutil
 from unittest.mock import mock_open, patch
 
 import pytest
 import tftest
 
 
+@pytest.fixture(autouse=True)
+def restore_files(fixtures_dir):
+  yield
+  # puts back originals left rewritten by failed or interrupted setups
+  tfdir = os.path.join(fixtures_dir, 'prevent_destroy')
+  for bkp_file in glob.glob(os.path.join(tfdir, '**', '*.tf.bkp'),
+                            recursive=True):
+    os.replace(bkp_file, bkp_file[:-len('.bkp')])
+
+
 def test_with_no_lifecycle_override(fixtures_dir):
   tf = tftest.TerraformTest('prevent_destroy', fixtures_dir)
   tf.setup()
@@ -58,3 +71,21 @@ def test_raises_exception_when_read_or_write_fails(mock_copy, fixtures_dir, capl
       tf.setup(disable_prevent_destroy=True)
   assert caplog.messages[0].startswith(
       'Unable to update prevent_destroy in file ')
+
+
+def test_setup_keeps_backups(fixtures_dir, tmp_path, stub_binary):
+  tfdir = str(tmp_path / 'prevent_destroy')
+  shutil.copytree(os.path.join(fixtures_dir, 'prevent_destroy'), tfdir)
+  tf_files = glob.glob(os.path.join(tfdir, '**', '*.tf'), recursive=True)
+  tf = tftest.TerraformTest(tfdir, binary=stub_binary)
+  with patch('tftest.shutil.copy', wraps=shutil.copy) as mock_copy:
+    tf.setup(disable_prevent_destroy=True, cleanup_on_exit=False)
+    assert mock_copy.call_count == len(tf_files)
+    tf.setup(disable_prevent_destroy=True, cleanup_on_exit=False)
+    assert mock_copy.call_count == len(tf_files)
+    with open(os.path.join(tfdir, 'main.tf.bkp')) as f:
+      assert 'prevent_destroy = true' in f.read()
+    # other instances never rely on this instance's rewrites
+    tftest.TerraformTest(tfdir, binary=stub_binary).setup(
+        disable_prevent_destroy=True, cleanup_on_exit=False)
+    assert mock_copy.call_count == 2 * len(tf_files)
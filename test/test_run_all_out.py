@@ -0,0 +1,41 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"Test parsing of Terragrunt run-all back to back JSON output."
+
+import json
+
+import pytest
+import tftest
+
+
+def test_parse():
+  out = '{"a": {"value": 1}}\n{"b": {"value": "}{"}}\n'
+  result = tftest._parse_run_all_out(out, tftest.TerraformValueDict)
+  assert [r.keys() for r in result] == [{'a': 1}.keys(), {'b': 1}.keys()]
+  assert result[1]['b'] == '}{'
+
+
+def test_parse_empty():
+  assert tftest._parse_run_all_out(' \n', tftest.TerraformValueDict) == []
+
+
+def test_parse_error():
+  with pytest.raises(json.JSONDecodeError):
+    tftest._parse_run_all_out('{"a": 1}\nfoo', tftest.TerraformValueDict)
+
+
+def test_parse_bytes():
+  out = bytearray(b'{"a": 1}\r\n{"b": 2}\r\n')
+  assert tftest._parse_run_all_out(out, dict) == [{'a': 1}, {'b': 2}]
@@ -28,3 +28,14 @@ def test_cmd_err(fixtures_dir):
   with pytest.raises(tftest.TerraformTestError) as e:
     tf.plan()
   assert e.value.cmd_error
+
+
+def test_errors():
+  err = ('\n\x1b[31m╷\x1b[0m\x1b[0m\n\x1b[31m│\x1b[0m \x1b[0m\x1b[1m\x1b[31m'
+         'Error: \x1b[0m\x1b[0m\x1b[1mInvalid reference\x1b[0m\n'
+         '\x1b[31m│\x1b[0m \x1b[0m\n'
+         '│ Error: Unsupported argument\n│ \n╵\nError: Failed to load\n')
+  e = tftest.TerraformTestError('message', err)
+  assert e.errors == ['Invalid reference', 'Unsupported argument',
+                      'Failed to load']
+  assert tftest.TerraformTestError('message').errors == []
@@ -14,9 +14,13 @@
 
 "Test the Terraform state wrapper class."
 
+import sys
+
 import pytest
 import tftest
 
+from unittest.mock import Mock, patch
+
 
 @pytest.fixture
 def state(fixtures_dir):
@@ -38,3 +42,86 @@ def test_resources(state):
   res = state.resources['module.vpc-remote.google_compute_network.network']
   assert res['mode'] == 'managed'
   assert res['instances'][0]['attributes']['name'] == 'remote'
+
+
+def test_output_from_state(fixtures_dir):
+  with open('%s/state.json' % fixtures_dir, 'rb') as fp:
+    out = tftest.TerraformCommandOutput(0, fp.read(), '')
+  tf = tftest.TerraformTest('plan_no_outputs', fixtures_dir)
+  with patch.object(tf, 'execute_command', return_value=out) as cmd:
+    assert tf.output_from_state('foo') == 'foo-value'
+    assert tf.output_from_state()['foo'] == 'foo-value'
+  cmd.assert_called_with('state', 'pull', decode=False)
+
+
+def test_output_from_state_fallback(fixtures_dir):
+  outputs = tftest.TerraformCommandOutput(
+      0, b'{"foo": {"value": "foo-value"}}', '')
+
+  def execute_command(cmd, *args, **kw):
+    if cmd == 'state':
+      raise tftest.TerraformTestError('state pull not supported')
+    return outputs
+
+  tf = tftest.TerraformTest('plan_no_outputs', fixtures_dir)
+  with patch.object(tf, 'execute_command', side_effect=execute_command):
+    assert tf.output_from_state('foo') == 'foo-value'
+    result = tf.output_from_state()
+  assert isinstance(result, tftest.TerraformValueDict)
+  assert result['foo'] == 'foo-value'
+
+
+class NotFound(Exception):
+  pass
+
+
+def gcs_modules(blob):
+  storage = Mock()
+  storage.Client.return_value.bucket.return_value.blob.return_value = blob
+  return {
+      'google': Mock(),
+      'google.api_core': Mock(),
+      'google.api_core.exceptions': Mock(NotFound=NotFound),
+      'google.cloud': Mock(storage=storage),
+      'google.cloud.storage': storage,
+  }
+
+
+def test_state_from_backend(fixtures_dir):
+  with open('%s/state.json' % fixtures_dir, 'rb') as fp:
+    blob = Mock(**{'download_as_bytes.return_value': fp.read()})
+  modules = gcs_modules(blob)
+  tf = tftest.TerraformTest('plan_no_outputs', fixtures_dir)
+  with patch.dict(sys.modules, modules):
+    state = tf.state_from_backend('bucket', prefix='tf/', workspace='dev')
+  assert state.outputs['foo'] == 'foo-value'
+  client = modules['google.cloud.storage'].Client.return_value
+  client.bucket.assert_called_once_with('bucket')
+  client.bucket.return_value.blob.assert_called_once_with('tf/dev.tfstate')
+
+
+def test_state_from_backend_not_found(fixtures_dir):
+  blob = Mock(**{'download_as_bytes.side_effect': NotFound()})
+  tf = tftest.TerraformTest('plan_no_outputs', fixtures_dir)
+  with patch.dict(sys.modules, gcs_modules(blob)):
+    with patch.object(tf, 'state_pull', return_value='pulled') as state_pull:
+      assert tf.state_from_backend('bucket') == 'pulled'
+  state_pull.assert_called_once_with()
+  blob.download_as_bytes.assert_called_once_with()
+
+
+def test_state_from_backend_missing_package(fixtures_dir):
+  tf = tftest.TerraformTest('plan_no_outputs', fixtures_dir)
+  with patch.dict(sys.modules, {'google.api_core.exceptions': None,
+                                'google.cloud': None}):
+    with pytest.raises(tftest.TerraformTestError):
+      tf.state_from_backend('bucket')
+
+
+def test_state_decoding():
+  raw = b'{"serial": 123456789012345678901234567890, "lineage": "a\xffb"}'
+  state = tftest.TerraformState(tftest._json_loads(raw))
+  assert state.serial == 123456789012345678901234567890
+  assert state.lineage == 'ab'
+  with pytest.raises(ValueError):
+    tftest._json_loads(b'not json')
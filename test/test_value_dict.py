@@ -36,3 +36,17 @@ def test_getitem_dict_attrs(wrapper):
 
 def test_iter(wrapper):
   assert [k for k in wrapper] == [k for k in _RAW]
+
+
+def test_sensitive(wrapper):
+  assert wrapper.sensitive == ('a',)
+
+
+def test_contains(wrapper):
+  assert 'a' in wrapper
+  assert 'c' not in wrapper
+
+
+def test_mapping_methods(wrapper):
+  assert wrapper.get('b') == 2
+  assert list(wrapper.values()) == [1, 2]
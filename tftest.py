@@ -22,27 +22,37 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import atexit
 import collections
 import glob
-import inspect
-import itertools
 import json
 import logging
 import os
 import pickle
 import re
+import selectors
 import shutil
 import stat
 import subprocess
 import sys
 import tempfile
+import threading
 import weakref
 
-from functools import partial
+from functools import cached_property, lru_cache, partial
 from hashlib import sha1
+try:
+  from hashlib import file_digest as _file_digest
+except ImportError:  # Python < 3.11
+  _file_digest = None
 from pathlib import Path
 from typing import List
 
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
 __version__ = '1.8.5'
 
 _LOGGER = logging.getLogger('tftest')
@@ -54,12 +64,52 @@ TerraformStateResource = collections.namedtuple(
     'TerraformStateResource', 'key provider type attributes depends_on raw')
 
 
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+# error summaries, optionally inside the box drawn around diagnostics
+_ERROR_RE = re.compile(r'^[\s\u2502]*Error: (.+)$', re.MULTILINE)
+
+
 class TerraformTestError(Exception):
 
   @property
   def cmd_error(self):
     return self.args[1] if len(self.args) > 1 else None
 
+  @property
+  def errors(self):
+    """Summaries of the Terraform errors reported in the command error."""
+    if not self.cmd_error:
+      return []
+    return [e.strip()
+            for e in _ERROR_RE.findall(_ANSI_RE.sub('', self.cmd_error))]
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+# digit runs that may not fit the 64 bit integers orjson parses exactly
+_WIDE_NUMBER_RE = re.compile(rb'\d{20,}')
+
+
+def _json_loads(data):
+  """Parse JSON command output, ignoring invalid UTF-8 like text output.
+
+  orjson is used if available, except for documents with invalid UTF-8 or
+  numbers that might not fit in 64 bits, which it rejects or turns to floats.
+  """
+  if isinstance(data, (bytes, bytearray)):
+    if orjson is not None and not _WIDE_NUMBER_RE.search(data):
+      try:
+        return orjson.loads(data)
+      except orjson.JSONDecodeError:
+        pass
+    data = data.decode('utf-8', errors='ignore')
+  return json.loads(data)
+
+
+_WHITESPACE_RE = re.compile(r'\s*')
+
+_PREVENT_DESTROY_RE = re.compile(r'prevent_destroy\s+=\s+true')
 
 _TG_BOOL_ARGS = [
     "no_auto_init",
@@ -87,6 +137,76 @@ _TG_KV_ARGS = [
 ]
 
 
+# keyword argument -> (kind, flag) for parse_args, where kind is one of
+#   flag: emit flag if the value is truthy
+#   true_flag / false_flag: emit flag if the value is True / False
+#   pair: emit flag and value as separate arguments if the value is truthy
+#   joined: emit 'flag value' as a single argument if the value is truthy
+#   mapping: emit flag=k=v for each item of a dict value
+#   assign: emit flag=v for a single value or each item of a list or tuple
+_ARGS_SCHEMA = {
+    **{f'tg_{arg}': ('flag', f'--terragrunt-{arg.replace("_", "-")}')
+       for arg in _TG_BOOL_ARGS},
+    **{f'tg_{arg}': ('pair', f'--terragrunt-{arg.replace("_", "-")}')
+       for arg in _TG_KV_ARGS},
+    'tg_parallelism': ('joined', '--terragrunt-parallelism'),
+    'tg_override_attr': ('mapping', '--terragrunt-override-attr'),
+    'auto_approve': ('flag', '-auto-approve'),
+    'backend': ('false_flag', '-backend=false'),
+    'color': ('false_flag', '-no-color'),
+    'force_copy': ('flag', '-force-copy'),
+    'input': ('false_flag', '-input=false'),
+    'json_format': ('true_flag', '-json'),
+    'lock': ('false_flag', '-lock=false'),
+    'parallelism': ('assign', '-parallelism'),
+    'plugin_dir': ('pair', '-plugin-dir'),
+    'refresh': ('false_flag', '-refresh=false'),
+    'state': ('pair', '-state'),
+    'upgrade': ('flag', '-upgrade'),
+}
+
+
+def _parse_flags(items):
+  """Convert (key, type, value) keyword triples to a tuple of flags.
+
+  Value types are part of the items so that equal values of different types
+  (eg 0 and False) never share a cache entry. Flags are emitted in schema
+  order, whatever the order of the keywords.
+  """
+  values = {key: value for key, _, value in items}
+  cmd_args = []
+  for key, (kind, flag) in _ARGS_SCHEMA.items():
+    if key not in values:
+      continue
+    value = values[key]
+    if kind == 'false_flag':
+      if value is False:
+        cmd_args.append(flag)
+    elif kind == 'true_flag':
+      if value is True:
+        cmd_args.append(flag)
+    elif kind == 'mapping':
+      if isinstance(value, dict):
+        cmd_args += [f'{flag}={k}={v}' for k, v in value.items()]
+    elif not value:
+      continue
+    elif kind == 'flag':
+      cmd_args.append(flag)
+    elif kind == 'pair':
+      cmd_args += [flag, value]
+    elif kind == 'joined':
+      cmd_args.append(f'{flag} {value}')
+    elif kind == 'assign':
+      if isinstance(value, (list, tuple)):
+        cmd_args += [f'{flag}={v}' for v in value]
+      else:
+        cmd_args.append(f'{flag}={value}')
+  return tuple(cmd_args)
+
+
+_cached_flags = lru_cache(maxsize=128)(_parse_flags)
+
+
 def parse_args(init_vars=None, tf_vars=None, targets=None, **kw):
   """Convert method arguments for use in Terraform commands.
 
@@ -99,71 +219,316 @@ def parse_args(init_vars=None, tf_vars=None, targets=None, **kw):
   Returns:
     A list of command arguments for use with subprocess.
   """
-  cmd_args = []
-
-  cmd_args += [
-      f'--terragrunt-{arg.replace("_", "-")}' for arg in _TG_BOOL_ARGS
-      if kw.get(f"tg_{arg}")
-  ]
-  for arg in _TG_KV_ARGS:
-    if kw.get(f"tg_{arg}"):
-      cmd_args += [f'--terragrunt-{arg.replace("_", "-")}',
-                   kw[f"tg_{arg}"]]
-  if kw.get('tg_parallelism'):
-    cmd_args.append(f'--terragrunt-parallelism {kw["tg_parallelism"]}')
-  if isinstance(kw.get('tg_override_attr'), dict):
-    cmd_args += [
-        '--terragrunt-override-attr={}={}'.format(k, v)
-        for k, v in kw.get('tg_override_attr').items()
-    ]
-
-  if kw.get('auto_approve'):
-    cmd_args.append('-auto-approve')
-  if kw.get('backend') is False:
-    cmd_args.append('-backend=false')
-  if kw.get('color') is False:
-    cmd_args.append('-no-color')
-  if kw.get('force_copy'):
-    cmd_args.append('-force-copy')
-  if kw.get('input') is False:
-    cmd_args.append('-input=false')
-  if kw.get('json_format') is True:
-    cmd_args.append('-json')
-  if kw.get('lock') is False:
-    cmd_args.append('-lock=false')
-  if kw.get('plugin_dir'):
-    cmd_args += ['-plugin-dir', kw['plugin_dir']]
-  if kw.get('refresh') is False:
-    cmd_args.append('-refresh=false')
-  if kw.get('state'):
-    cmd_args += ['-state', kw['state']]
-  if kw.get('upgrade'):
-    cmd_args.append('-upgrade')
+  tf_var_file = kw.pop('tf_var_file', None)
+  items = tuple((k, type(v), v) for k, v in kw.items())
+  try:
+    cmd_args = list(_cached_flags(items))
+  except TypeError:
+    # unhashable values (eg lists or dicts) cannot be cached
+    cmd_args = list(_parse_flags(items))
   if isinstance(init_vars, dict):
-    cmd_args += [
-        '-backend-config={}={}'.format(k, v) for k, v in init_vars.items()
-    ]
+    cmd_args += [f'-backend-config={k}={v}' for k, v in init_vars.items()]
   elif isinstance(init_vars, str):
-    cmd_args += ['-backend-config', '{}'.format(init_vars)]
+    cmd_args += ['-backend-config', init_vars]
   if tf_vars:
-    cmd_args += list(
-        itertools.chain.from_iterable(
-            ("-var",
-             "{}={}".format(k,
-                            json.dumps(v) if isinstance(v, (dict,
-                                                            list)) else v))
-            for k, v in tf_vars.items()))
+    for k, v in tf_vars.items():
+      if isinstance(v, (dict, list)):
+        v = json.dumps(v)
+      cmd_args += ('-var', f'{k}={v}')
   if targets:
-    cmd_args += [("-target={}".format(t)) for t in targets]
-  if kw.get('tf_var_file'):
-    tf_var_file = kw['tf_var_file']
-    if isinstance(tf_var_file, (list, tuple)):
-      cmd_args += ['-var-file={}'.format(v) for v in tf_var_file]
-    else:
-      cmd_args.append('-var-file={}'.format(tf_var_file))
+    cmd_args += [f'-target={t}' for t in targets]
+  # var files go last, terraform applies -var and -var-file in command order
+  if isinstance(tf_var_file, (list, tuple)):
+    cmd_args += [f'-var-file={v}' for v in tf_var_file]
+  elif tf_var_file:
+    cmd_args.append(f'-var-file={tf_var_file}')
   return cmd_args
 
 
+# stderr is merged into stdout on Windows, where pipes cannot be selected
+_POPEN_KW = {
+    'stdout': subprocess.PIPE,
+    'stderr': subprocess.STDOUT if os.name == 'nt' else subprocess.PIPE,
+}
+
+
+def _caller_filename():
+  """Return the file name of the closest caller outside this module.
+
+  Frames are matched by module name rather than stack depth, so that the
+  result is the same for subclasses and when this module is compiled.
+  """
+  frame = sys._getframe(0)
+  while frame.f_back and frame.f_globals.get('__name__') == __name__:
+    frame = frame.f_back
+  return frame.f_code.co_filename
+
+
+@lru_cache(maxsize=512)
+def _abspath_cached(basedir, path):
+  """Make relative path absolute from basedir, memoized across instances."""
+  return path if os.path.isabs(path) else os.path.join(basedir, path)
+
+
+def _decode(output):
+  """Decode command output the way text mode pipes would."""
+  output = output.decode('utf-8', errors='ignore')
+  if '\r' in output:
+    output = output.replace('\r\n', '\n').replace('\r', '\n')
+  return output
+
+
+def _read_all(stream, chunk_size=1 << 20):
+  """Read a binary stream to EOF into a single growing buffer."""
+  output = bytearray()
+  chunk = memoryview(bytearray(chunk_size))
+  while True:
+    size = stream.readinto(chunk)
+    if not size:
+      return output
+    output += chunk[:size]
+
+
+def _read_output(p, log_output=False, chunk_size=1 << 16):
+  """Read stdout and stderr of a process until both reach EOF.
+
+  Both pipes are drained as data arrives, so a verbose stderr can never fill
+  up and stall the process. Complete stdout lines are logged as they are
+  received if log_output is set.
+  """
+  if p.stderr is None:
+    # stderr is merged into stdout (Windows)
+    if not log_output:
+      return _read_all(p.stdout), None
+    out = bytearray()
+    for line in p.stdout:
+      _LOGGER.info(_decode(line).strip())
+      out += line
+    return out, None
+  out, err = bytearray(), bytearray()
+  buffers = {p.stdout.fileno(): out, p.stderr.fileno(): err}
+  logged = 0
+  with selectors.DefaultSelector() as selector:
+    for fd in buffers:
+      selector.register(fd, selectors.EVENT_READ)
+    while selector.get_map():
+      for key, _ in selector.select():
+        chunk = os.read(key.fd, chunk_size)
+        if not chunk:
+          selector.unregister(key.fd)
+          continue
+        buffers[key.fd] += chunk
+        if log_output and buffers[key.fd] is out:
+          end = out.rfind(b'\n', logged) + 1
+          for line in out[logged:end].splitlines():
+            _LOGGER.info(_decode(line).strip())
+          logged = max(logged, end)
+  if log_output and logged < len(out):
+    _LOGGER.info(_decode(out[logged:]).strip())
+  return out, err
+
+
+def _json_dumps(obj, sort_keys=False):
+  """Serialize obj to compact JSON bytes, with orjson if available.
+
+  For the strings, numbers and containers found in method arguments orjson
+  output matches the standard library's, so sorted output used for hashing
+  rarely depends on whether orjson is installed.
+  """
+  if orjson is not None:
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+      option |= orjson.OPT_SORT_KEYS
+    try:
+      return orjson.dumps(obj, default=str, option=option)
+    except TypeError:
+      # eg integers over 64 bits
+      pass
+  return json.dumps(obj, sort_keys=sort_keys, default=str, ensure_ascii=False,
+                    separators=(',', ':')).encode('utf-8')
+
+
+def _hash_file(hash, path, chunk_size=1 << 18):
+  """Update hash with the contents of a file, read in large chunks."""
+  with open(path, 'rb', buffering=0) as f:
+    if _file_digest is not None:
+      return _file_digest(f, lambda: hash)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+      size = f.readinto(buffer)
+      if not size:
+        return hash
+      hash.update(view[:size])
+
+
+def _list_files(directory, ignore_hidden=False, exclude_directories=(),
+                excluded_extensions=()):
+  """Return the sorted relative paths of files in a directory tree."""
+  files = []
+  stack = ['']
+  while stack:
+    relpath = stack.pop()
+    try:
+      entries = os.scandir(os.path.join(directory, relpath))
+    except FileNotFoundError:
+      continue
+    with entries:
+      for entry in entries:
+        name = entry.name
+        if entry.is_file():
+          if ignore_hidden and name.startswith('.'):
+            continue
+          if os.path.splitext(name)[1] in excluded_extensions:
+            continue
+          files.append(os.path.join(relpath, name))
+        elif entry.is_dir() and name not in exclude_directories:
+          if name.startswith(_RMTREE_PREFIX):
+            # directory pending removal
+            continue
+          stack.append(os.path.join(relpath, name))
+  files.sort()
+  return files
+
+
+def _find_files(top, suffix):
+  """Return the paths of files with a given suffix in a directory tree."""
+  return [os.path.join(root, name)
+          for root, _, files in os.walk(top)
+          for name in files if name.endswith(suffix)]
+
+
+def _link(src, dst, dir_fd=None):
+  """Hard link src to dst, falling back to a symlink (eg across devices).
+
+  A relative dst is resolved against dir_fd if given.
+  """
+  try:
+    os.link(src, dst, dst_dir_fd=dir_fd)
+  except (FileNotFoundError, FileExistsError):
+    raise
+  except OSError:
+    if os.path.isdir(src):
+      raise IsADirectoryError(src)
+    os.symlink(src, dst, dir_fd=dir_fd)
+
+
+# whether links can be created relative to an open directory
+_LINK_DIR_FD = os.link in os.supports_dir_fd and \
+    os.symlink in os.supports_dir_fd
+
+
+_RMTREE_PREFIX = '.tftest-rm-'
+
+_RMTREE_SYNC = False
+
+_RMTREE_THREADS = []
+
+# renamed trees still being removed by this process
+_RMTREE_PENDING = set()
+
+# minimum number of files for _dirhash to hash them on a thread pool
+_DIRHASH_PARALLEL_MIN = 16
+
+
+def _fast_rmtree(path, onerror=None):
+  """Remove a directory tree with one scandir pass per directory.
+
+  Entry types come from the cached dirent so no extra stat is needed. Any
+  error (eg read-only files) hands the remaining tree over to shutil.rmtree.
+  A symlink to a directory is unlinked, its target is never walked.
+  """
+  try:
+    if os.path.islink(path):
+      os.unlink(path)
+      return
+    stack = [(path, False)]
+    while stack:
+      top, scanned = stack.pop()
+      if scanned:
+        os.rmdir(top)
+        continue
+      stack.append((top, True))
+      with os.scandir(top) as it:
+        for entry in it:
+          if entry.is_dir(follow_symlinks=False):
+            stack.append((entry.path, False))
+          else:
+            os.unlink(entry.path)
+  except OSError as e:
+    if isinstance(e, FileNotFoundError) and e.filename == path:
+      return
+    shutil.rmtree(path, onerror=onerror)
+
+
+def _rmtree(path, onerror=None):
+  """Remove a directory tree, off the calling thread when possible.
+
+  The tree is first renamed to a unique hidden sibling so that its original
+  path is immediately free, then removed in a background thread. Removal is
+  synchronous if the rename fails (eg cross-device) or at interpreter exit.
+  Renamed trees left behind by a killed process are removed by setup.
+  A missing path is ignored, and a symlink is unlinked without touching its
+  target.
+  """
+  if not _RMTREE_SYNC and not os.path.islink(path):
+    # uuid is only imported here as it pulls in platform at import time
+    import uuid
+    renamed = os.path.join(os.path.dirname(path),
+                           _RMTREE_PREFIX + uuid.uuid4().hex)
+    try:
+      os.rename(path, renamed)
+    except FileNotFoundError:
+      return
+    except OSError:
+      pass
+    else:
+      _RMTREE_PENDING.add(renamed)
+      thread = threading.Thread(target=_rmtree_pending, args=(renamed,),
+                                kwargs={'onerror': onerror})
+      thread.start()
+      _RMTREE_THREADS[:] = [t for t in _RMTREE_THREADS if t.is_alive()]
+      _RMTREE_THREADS.append(thread)
+      return
+  _fast_rmtree(path, onerror=onerror)
+
+
+def _rmtree_pending(path, onerror=None):
+  """Remove a renamed tree, then drop it from the pending set."""
+  try:
+    _fast_rmtree(path, onerror=onerror)
+  finally:
+    _RMTREE_PENDING.discard(path)
+
+
+def _rmtree_sweep(top):
+  """Remove renamed trees left behind by interrupted background removals.
+
+  Hidden folders are not descended into, which is where renamed trees of
+  .terraform and .terragrunt-cache folders are found.
+  """
+  for root, dirs, _ in os.walk(top):
+    visible = []
+    for name in dirs:
+      if name.startswith(_RMTREE_PREFIX):
+        path = os.path.join(root, name)
+        if path not in _RMTREE_PENDING:
+          _LOGGER.debug('removing stale %s', path)
+          shutil.rmtree(path, ignore_errors=True)
+      elif not name.startswith('.'):
+        visible.append(name)
+    dirs[:] = visible
+
+
+@atexit.register
+def _rmtree_wait():
+  """Wait for pending removals and remove synchronously from now on."""
+  global _RMTREE_SYNC
+  _RMTREE_SYNC = True
+  while _RMTREE_THREADS:
+    _RMTREE_THREADS.pop().join()
+
+
 class TerraformJSONBase(collections.abc.Mapping):
   "Base class for JSON wrappers."
 
@@ -173,6 +538,9 @@ class TerraformJSONBase(collections.abc.Mapping):
   def __bytes__(self):
     return bytes(self._raw)
 
+  def __contains__(self, key):
+    return key in self._raw
+
   def __getitem__(self, index):
     return self._raw[index]
 
@@ -185,14 +553,20 @@ class TerraformJSONBase(collections.abc.Mapping):
   def __str__(self):
     return str(self._raw)
 
+  def keys(self):
+    return self._raw.keys()
+
 
 class TerraformValueDict(TerraformJSONBase):
   "Minimal wrapper to directly expose outputs or variables."
 
   def __init__(self, raw):
     super(TerraformValueDict, self).__init__(raw)
+
+  @cached_property
+  def sensitive(self):
     # only matters for outputs
-    self.sensitive = tuple(k for k, v in raw.items() if v.get('sensitive'))
+    return tuple([k for k, v in self._raw.items() if v.get('sensitive')])
 
   def __getattr__(self, name):
     if isinstance(name, str) and name[:2] == name[-2:] == '__':
@@ -216,34 +590,50 @@ class TerraformPlanModule(TerraformJSONBase):
   @property
   def child_modules(self):
     if self._modules is None:
-      self._modules = dict(
-          (mod['address'][self._strip:], TerraformPlanModule(mod))
-          for mod in self._raw.get('child_modules', {}))
+      strip = self._strip
+      self._modules = {
+          sys.intern(mod['address'][strip:]): TerraformPlanModule(mod)
+          for mod in self._raw.get('child_modules', ())
+      }
     return self._modules
 
   @property
   def resources(self):
     if self._resources is None:
-      self._resources = dict((res['address'][self._strip:], res)
-                             for res in self._raw.get('resources', []))
+      strip = self._strip
+      self._resources = {
+          sys.intern(res['address'][strip:]): res
+          for res in self._raw.get('resources', ())
+      }
     return self._resources
 
 
 class TerraformPlanOutput(TerraformJSONBase):
   "Minimal wrapper for Terraform plan JSON output."
 
-  def __init__(self, raw):
-    super(TerraformPlanOutput, self).__init__(raw)
-    planned_values = raw.get('planned_values', {})
-    self.root_module = TerraformPlanModule(planned_values.get(
-        'root_module', {}))
-    self.outputs = TerraformValueDict(planned_values.get('outputs', {}))
-    self.resource_changes = dict(
-        (v['address'], v) for v in self._raw.get('resource_changes', {}))
+  @cached_property
+  def root_module(self):
+    return TerraformPlanModule(
+        self._raw.get('planned_values', {}).get('root_module', {}))
+
+  @cached_property
+  def outputs(self):
+    return TerraformValueDict(
+        self._raw.get('planned_values', {}).get('outputs', {}))
+
+  @cached_property
+  def variables(self):
     # there might be no variables defined
-    self.variables = TerraformValueDict(raw.get('variables', {}))
-    self.prior_root_module = TerraformPlanModule(
-        raw.get('prior_state', {}).get('values', {}).get('root_module', {}))
+    return TerraformValueDict(self._raw.get('variables', {}))
+
+  @cached_property
+  def prior_root_module(self):
+    return TerraformPlanModule(self._raw.get('prior_state', {}).get(
+        'values', {}).get('root_module', {}))
+
+  @cached_property
+  def resource_changes(self):
+    return {v['address']: v for v in self._raw.get('resource_changes', ())}
 
   @property
   def resources(self):
@@ -261,7 +651,8 @@ class TerraformPlanOutput(TerraformJSONBase):
     return self._raw[name]
 
   def __getstate__(self):
-    return self.__dict__
+    # cached properties are rebuilt from the raw JSON when accessed
+    return {'_raw': self._raw}
 
   def __setstate__(self, d):
     self.__dict__.update(d)
@@ -270,32 +661,69 @@ class TerraformPlanOutput(TerraformJSONBase):
 class TerraformState(TerraformJSONBase):
   "Minimal wrapper for Terraform state JSON format."
 
-  def __init__(self, raw):
-    super(TerraformState, self).__init__(raw)
-    self.outputs = TerraformValueDict(raw.get('outputs', {}))
-    self._resources = None
+  @cached_property
+  def outputs(self):
+    return TerraformValueDict(self._raw.get('outputs', {}))
 
-  @property
+  @cached_property
   def resources(self):
-    if not self._resources:
-      resources = {}
-      for res in self._raw['resources']:
-        name = '%s.%s.%s' % (res.get('module'), res.get('type'),
-                             res.get('name'))
-        resources[name] = res
-      self._resources = resources
-    return self._resources
+    # root module resources have no module key
+    return {sys.intern(f"{res.get('module')}.{res['type']}.{res['name']}"): res
+            for res in self._raw['resources']}
 
   def __getattr__(self, name):
     return self._raw[name]
 
   def __getstate__(self):
-    return self.__dict__
+    # cached properties are rebuilt from the raw JSON when accessed
+    return {'_raw': self._raw}
 
   def __setstate__(self, d):
     self.__dict__.update(d)
 
 
+# tag line -> wrapper type for cache entries stored as JSON
+_CACHE_JSON_TYPES = {
+    b'plan': TerraformPlanOutput,
+    b'values': TerraformValueDict,
+    b'json': None,
+}
+
+
+def _cache_dumps(out):
+  """Serialize a cached method output, avoiding pickle for JSON and text."""
+  if isinstance(out, str):
+    return b'str\n' + out.encode('utf-8', errors='surrogateescape')
+  if type(out) is TerraformPlanOutput:
+    tag, raw = b'plan', out._raw
+  elif type(out) is TerraformValueDict:
+    tag, raw = b'values', out._raw
+  elif type(out) is dict:
+    tag, raw = b'json', out
+  else:
+    return pickle.dumps(out, pickle.HIGHEST_PROTOCOL)
+  return tag + b'\n' + _json_dumps(raw)
+
+
+def _file_signature(f):
+  """Return an identity for an open file's current content."""
+  st = os.fstat(f.fileno())
+  return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _cache_loads(data):
+  """Deserialize a cached method output from _cache_dumps."""
+  if data[:1] == b'\x80':
+    # pickle protocol 2 and above
+    return pickle.loads(data)
+  tag, _, body = data.partition(b'\n')
+  if tag == b'str':
+    return body.decode('utf-8', errors='surrogateescape')
+  cls = _CACHE_JSON_TYPES[tag]
+  raw = _json_loads(body)
+  return raw if cls is None else cls(raw)
+
+
 class TerraformTest(object):
   """Helper class for use in testing Terraform modules.
 
@@ -324,28 +752,50 @@ class TerraformTest(object):
     enable_cache: Determines if the caching enabled for specific methods
     cache_dir: optional base directory to use for caching, defaults to
       the directory of the python file that instantiates this class
+    plugin_cache_dir: optional provider plugin cache directory shared across
+      instances, either absolute or relative to basedir
   """
 
   def __init__(self, tfdir, basedir=None, binary='terraform', env=None,
-               enable_cache=False, cache_dir=None):
+               enable_cache=False, cache_dir=None, plugin_cache_dir=None):
     """Set Terraform folder to operate on, and optional base directory."""
     self._basedir = basedir or os.getcwd()
     self.binary = binary
     self.tfdir = self._abspath(tfdir)
+    if plugin_cache_dir:
+      # providers are downloaded once and linked from the cache by init
+      plugin_cache_dir = self._abspath(plugin_cache_dir)
+      os.makedirs(plugin_cache_dir, exist_ok=True)
+      env = {**(env or {}), 'TF_PLUGIN_CACHE_DIR': plugin_cache_dir}
     self._env = env or {}
-    self.env = os.environ.copy()
     self.tg_run_all = False
-    self._plan_formatter = lambda out: TerraformPlanOutput(json.loads(out))
+    self._plan_formatter = lambda out: TerraformPlanOutput(_json_loads(out))
     self._output_formatter = lambda out: TerraformValueDict(
-        json.loads(out))
+        _json_loads(out))
     self.enable_cache = enable_cache
+    self._tfdir_hash_cache = None
+    self._const_hash_cache = None
+    self._cache_memo = {}
+    # digests of .tf files rewritten by this instance's setup
+    self._prevent_destroy_digests = {}
     if not cache_dir:
       self.cache_dir = Path(os.path.dirname(
-          inspect.stack()[1].filename)) / ".tftest-cache"
+          _caller_filename())) / ".tftest-cache"
     else:
       self.cache_dir = Path(cache_dir)
-    if env is not None:
-      self.env.update(env)
+    # None lets commands inherit os.environ without copying it
+    self._env_override = {**os.environ, **env} if env else None
+
+  @property
+  def env(self):
+    """Environment passed to commands, copied from os.environ on first use."""
+    if self._env_override is None:
+      self._env_override = os.environ.copy()
+    return self._env_override
+
+  @env.setter
+  def env(self, value):
+    self._env_override = value
 
   @classmethod
   def _cleanup(cls, tfdir, filenames, deep=True, restore_files=False):
@@ -362,99 +812,145 @@ class TerraformTest(object):
       os.unlink(path)
     if not deep:
       return
-    path = os.path.join(tfdir, '.terraform')
-    if os.path.isdir(path):
-      shutil.rmtree(path, onerror=remove_readonly)
-    path = os.path.join(tfdir, '.terraform.lock.hcl')
-    if os.path.isfile(path):
-      os.unlink(path)
-    path = os.path.join(tfdir, 'terraform.tfstate')
-    if os.path.isfile(path):
-      os.unlink(path)
-    for path in glob.glob(os.path.join(tfdir, 'terraform.tfstate.backup*')):
-      if os.path.isfile(path):
+    # attempt each removal directly instead of checking for existence first
+    _rmtree(os.path.join(tfdir, '.terraform'), onerror=remove_readonly)
+    for path in (os.path.join(tfdir, '.terraform.lock.hcl'),
+                 os.path.join(tfdir, 'terraform.tfstate'),
+                 *glob.glob(os.path.join(tfdir, 'terraform.tfstate.backup*'))):
+      try:
         os.unlink(path)
-    path = os.path.join(tfdir, '**', '.terragrunt-cache*')
-    for tg_dir in glob.glob(path, recursive=True):
-      if os.path.isdir(tg_dir):
-        shutil.rmtree(tg_dir, onerror=remove_readonly)
+      except (FileNotFoundError, IsADirectoryError):
+        pass
+    # one walk, not descending into hidden folders as recursive glob did
+    for root, dirs, _ in os.walk(tfdir):
+      visible = []
+      for name in dirs:
+        if name.startswith('.terragrunt-cache'):
+          path = os.path.join(root, name)
+          if not os.path.islink(path):
+            _rmtree(path, onerror=remove_readonly)
+        elif not name.startswith('.'):
+          visible.append(name)
+      dirs[:] = visible
     _LOGGER.debug(
         'Restoring original TF files after prevent destroy changes')
     if restore_files:
-      for bkp_file in Path(tfdir).rglob('*.bkp'):
+      for bkp_file in _find_files(tfdir, '.bkp'):
         try:
-          shutil.copy(str(bkp_file),
-                      f'{str(bkp_file).strip(".bkp")}')
+          shutil.copy(bkp_file, bkp_file[:-len('.bkp')])
         except (IOError, OSError):
-          _LOGGER.exception(
-              f'Unable to restore terraform file {bkp_file.resolve()}')
+          _LOGGER.exception(f'Unable to restore terraform file {bkp_file}')
           raise TerraformTestError(
-              f'Restore of terraform file ({bkp_file.resolve()}) failed')
+              f'Restore of terraform file ({bkp_file}) failed')
         else:
-          bkp_file.unlink(True)
+          try:
+            os.unlink(bkp_file)
+          except FileNotFoundError:
+            pass
+
+  @classmethod
+  def run_parallel(cls, tests, method, max_workers=None, **kw):
+    """Call the same method on multiple instances concurrently.
+
+    Each instance must operate on a distinct tfdir. Results are returned in
+    the same order as tests.
+
+    Args:
+      tests: iterable of instances to run the method on.
+      method: name of the method to call, e.g. 'setup' or 'plan'.
+      max_workers: optional number of worker threads, defaults to CPU count.
+      kw: keyword arguments passed to each method call.
+    """
+    # concurrent.futures is only imported here to keep module import fast
+    from concurrent.futures import ThreadPoolExecutor
+    tests = list(tests)
+    if not tests:
+      return []
+    max_workers = max_workers or min(len(tests), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      futures = [executor.submit(getattr(t, method), **kw) for t in tests]
+      return [f.result() for f in futures]
 
   def _abspath(self, path):
     """Make relative path absolute from base dir."""
-    return path if os.path.isabs(path) else os.path.join(self._basedir, path)
+    return _abspath_cached(self._basedir, path)
 
   def _dirhash(self, directory, hash, ignore_hidden=False,
                exclude_directories=[], excluded_extensions=[]):
-    """Returns hash of directory's file contents"""
+    """Returns hash of directory's file paths and contents"""
     assert Path(directory).is_dir()
+    paths = _list_files(directory, ignore_hidden, exclude_directories,
+                        excluded_extensions)
+
+    def digest(path):
+      return _hash_file(sha1(), os.path.join(directory, path)).digest()
+
+    if len(paths) < _DIRHASH_PARALLEL_MIN:
+      digests = map(digest, paths)
+    else:
+      # hashlib releases the GIL on large updates, so files hash in parallel
+      from concurrent.futures import ThreadPoolExecutor
+      with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as ex:
+        digests = list(ex.map(digest, paths))
+    for path, file_digest in zip(paths, digests):
+      hash.update(path.encode('utf-8', errors='surrogateescape') + b'\0')
+      hash.update(file_digest)
+    return hash
+
+  def _tfdir_hash(self):
+    """Returns hash of tfdir, reused while no file changes size or mtime"""
+    tfdir = self.tfdir
+    # excludes .terraform/, hidden files, tfstate files from being used for hash
+    filters = dict(ignore_hidden=True, exclude_directories=[".terraform"],
+                   excluded_extensions=['.backup', '.tfstate'])
     try:
-      dir_iter = sorted(Path(directory).iterdir(),
-                        key=lambda p: str(p).lower())
+      signature = [(path, st.st_mtime_ns, st.st_size)
+                   for path in _list_files(tfdir, **filters)
+                   for st in (os.stat(os.path.join(tfdir, path)),)]
     except FileNotFoundError:
-      return hash
-    for path in dir_iter:
-      if path.is_file():
-        if ignore_hidden and path.name.startswith("."):
-          continue
-        if path.suffix in excluded_extensions:
-          continue
-        with open(path, "rb") as f:
-          for chunk in iter(lambda: f.read(4096), b""):
-            hash.update(chunk)
-      elif path.is_dir() and path.name not in exclude_directories:
-        hash = self._dirhash(path, hash, ignore_hidden=ignore_hidden,
-                             exclude_directories=exclude_directories,
-                             excluded_extensions=excluded_extensions)
-    return hash
+      signature = None
+    cached = self._tfdir_hash_cache
+    if signature is not None and cached and cached[0] == (tfdir, signature):
+      return cached[1]
+    digest = self._dirhash(tfdir, sha1(), **filters).hexdigest()
+    if signature is not None:
+      self._tfdir_hash_cache = ((tfdir, signature), digest)
+    return digest
+
+  def _const_hash(self):
+    """Returns a sha1 object primed with the instance's constant attributes"""
+    key = (self.binary, self._basedir)
+    cached = self._const_hash_cache
+    if cached is None or cached[0] != key:
+      cached = (key, sha1(_json_dumps(
+          {"binary": key[0], "_basedir": key[1]}, sort_keys=True)))
+      self._const_hash_cache = cached
+    return cached[1].copy()
 
   def generate_cache_hash(self, method_kwargs):
     """Returns a hash value using the instance's attributes and method keyword arguments"""
-    params = {
-        **{
-            k: v for k, v in self.__dict__.items()
-            # only uses instance attributes that are involved in the results of
-            # the decorated method
-            if k in ["binary", "_basedir", "tfdir", "_env"]
-        },
-        **method_kwargs,
-    }
+    # only uses instance attributes that are involved in the results of
+    # the decorated method, binary and basedir are hashed once per instance
+    params = {"_env": self._env, **method_kwargs}
 
     # creates hash of file contents
     for path_param in ["extra_files", "tf_var_file"]:
       if path_param in method_kwargs:
         if isinstance(method_kwargs[path_param], list):
           params[path_param] = [
-              sha1(open(fp, 'rb').read()).hexdigest()
+              _hash_file(sha1(), fp).hexdigest()
               for fp in method_kwargs[path_param]
           ]
         else:
-          params[path_param] = sha1(
-              open(method_kwargs[path_param], 'rb').read()).hexdigest()
+          params[path_param] = _hash_file(
+              sha1(), method_kwargs[path_param]).hexdigest()
 
     # creates hash of all file content within tfdir
-    # excludes .terraform/, hidden files, tfstate files from being used for hash
-    params["tfdir"] = self._dirhash(self.tfdir, sha1(), ignore_hidden=True,
-                                    exclude_directories=[".terraform"],
-                                    excluded_extensions=['.backup', '.tfstate'
-                                                         ]).hexdigest()
+    params["tfdir"] = self._tfdir_hash()
 
-    return sha1(
-        json.dumps(params, sort_keys=True,
-                   default=str).encode("cp037")).hexdigest() + ".pickle"
+    hash = self._const_hash()
+    hash.update(_json_dumps(params, sort_keys=True))
+    return hash.hexdigest() + ".cache"
 
   def _cache(func):
 
@@ -475,9 +971,9 @@ class TerraformTest(object):
         return func(self, **kwargs)
 
       cache_dir = self.cache_dir / \
-          Path(sha1(self.tfdir.encode("cp037")).hexdigest()) / \
+          Path(sha1(self.tfdir.encode('utf-8',
+                                      errors='surrogateescape')).hexdigest()) / \
           Path(func.__name__)
-      cache_dir.mkdir(parents=True, exist_ok=True)
 
       hash_filename = self.generate_cache_hash(kwargs)
       cache_key = cache_dir / hash_filename
@@ -489,7 +985,14 @@ class TerraformTest(object):
         _LOGGER.debug("Could not read cache path")
       else:
         _LOGGER.info("Getting output from cache")
-        return pickle.load(f)
+        with f:
+          signature = _file_signature(f)
+          memo = self._cache_memo.get(cache_key)
+          if memo is None or memo[0] != signature:
+            memo = (signature, f.read())
+            self._cache_memo[cache_key] = memo
+        # decoded on each hit, so that callers never share a mutable result
+        return _cache_loads(memo[1])
 
       _LOGGER.info("Running command")
       out = func(self, **kwargs)
@@ -503,13 +1006,27 @@ class TerraformTest(object):
         _LOGGER.debug("Cache key: %s", cache_key)
 
         _LOGGER.info("Writing command to cache")
+        # writes to a temporary file renamed in place, so that concurrent
+        # test processes sharing the cache never read a partial entry
+        import uuid
+        tmp_key = cache_dir / f".{hash_filename}.{uuid.uuid4().hex}.tmp"
+        data = _cache_dumps(out)
         try:
-          f = cache_key.open("wb")
+          cache_dir.mkdir(parents=True, exist_ok=True)
+          f = tmp_key.open("wb")
         except OSError as e:
           _LOGGER.error("Cache could not write path")
         else:
-          with f:
-            pickle.dump(out, f, pickle.HIGHEST_PROTOCOL)
+          try:
+            with f:
+              f.write(data)
+              f.flush()
+              signature = _file_signature(f)
+            os.replace(tmp_key, cache_key)
+          except BaseException:
+            tmp_key.unlink(missing_ok=True)
+            raise
+          self._cache_memo[cache_key] = (signature, data)
 
       return out
 
@@ -538,54 +1055,82 @@ class TerraformTest(object):
     Returns:
       Terraform init output.
     """
+    _rmtree_sweep(self.tfdir)
     # remove lifecycle prevent destroy
     if disable_prevent_destroy:
       min_python = (3, 5)
       if sys.version_info < min_python:
         raise TerraformTestError(
             'The disable_prevent_destroy flag requires at least Python 3.5')
-      for tf_file in Path(self.tfdir).rglob('*.tf'):
+      # files this instance already rewrote and that are unchanged since are
+      # skipped, so that their backups of the original content are kept
+      rewritten = self._prevent_destroy_digests
+      for tf_file in _find_files(self.tfdir, '.tf'):
+        digest = rewritten.get(tf_file)
+        if digest and os.path.exists(f'{tf_file}.bkp') and \
+                _hash_file(sha1(), tf_file).hexdigest() == digest:
+          continue
         try:
-          shutil.copy(str(tf_file), f'{str(tf_file)}.bkp')
+          shutil.copy(tf_file, f'{tf_file}.bkp')
         # except (OSError, IOError) as exc:
         except (OSError, IOError):
-          _LOGGER.exception(
-              f'Unable to backup terraform file {tf_file.resolve()}')
+          _LOGGER.exception(f'Unable to backup terraform file {tf_file}')
           raise TerraformTestError(
-              f'Backup of terraform file ({tf_file.resolve()}) failed')
+              f'Backup of terraform file ({tf_file}) failed')
         try:
           with open(tf_file, 'r') as src:
             terraform = src.read()
           with open(tf_file, 'w') as src:
-            terraform = re.sub(r'prevent_destroy\s+=\s+true',
-                               'prevent_destroy = false', terraform)
+            terraform = _PREVENT_DESTROY_RE.sub('prevent_destroy = false',
+                                                terraform)
             src.write(terraform)
         except (OSError, IOError):
           _LOGGER.exception(
-              f'Unable to update prevent_destroy in file {tf_file.resolve()}')
+              f'Unable to update prevent_destroy in file {tf_file}')
           raise TerraformTestError(
-              f'Unable to update prevent_destroy in file ({tf_file.resolve()}) failed'
+              f'Unable to update prevent_destroy in file ({tf_file}) failed'
           )
+        rewritten[tf_file] = _hash_file(sha1(), tf_file).hexdigest()
 
     # link extra files inside dir
     filenames = []
-    for link_src in (extra_files or []):
-      link_src = self._abspath(link_src)
-      filename = os.path.basename(link_src)
-      if os.path.isfile(link_src):
-        link_dst = os.path.join(self.tfdir, filename)
+    # one directory scan instead of a stat per linked file
+    existing = set()
+    if extra_files:
+      with os.scandir(self.tfdir) as entries:
+        existing = {e.name for e in entries}
+    abspath, basename, join = self._abspath, os.path.basename, os.path.join
+    tfdir = self.tfdir
+    tfdir_fd = None
+    if os.name == 'nt':
+      link = shutil.copy
+    elif extra_files and _LINK_DIR_FD:
+      # link relative to an open tfdir, resolving its path only once
+      tfdir_fd = os.open(tfdir, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+      link = partial(_link, dir_fd=tfdir_fd)
+    else:
+      link = _link
+    try:
+      for link_src in (extra_files or []):
+        link_src = abspath(link_src)
+        filename = basename(link_src)
+        if filename in existing:
+          _LOGGER.warning('file exists: {}'.format(filename))
+          continue
         try:
-          if os.name == 'nt':
-            shutil.copy(link_src, link_dst)
-          else:
-            os.symlink(link_src, link_dst)
-          filenames.append(filename)
+          link(link_src,
+               filename if tfdir_fd is not None else join(tfdir, filename))
+        except (FileNotFoundError, IsADirectoryError):
+          _LOGGER.warning('no such file {}'.format(link_src))
         except FileExistsError as e:  # pylint:disable=undefined-variable
           _LOGGER.warning(e)
         else:
+          existing.add(filename)
+          filenames.append(filename)
           _LOGGER.debug('linked %s', link_src)
-      else:
-        _LOGGER.warning('no such file {}'.format(link_src))
+    finally:
+      if tfdir_fd is not None:
+        os.close(tfdir_fd)
     self._finalizer = weakref.finalize(self, self._cleanup, self.tfdir,
                                        filenames, deep=cleanup_on_exit,
                                        restore_files=disable_prevent_destroy)
@@ -606,20 +1151,17 @@ class TerraformTest(object):
 
   def workspace(self, name=None):
     """Run Terraform workspace command."""
-    raw_ws_out = self.execute_command('workspace', *['list']).out
-    cmd_args = ['select', name]
-    if name not in [
-        ws.replace('*', '').strip()
-        for ws in raw_ws_out.split('\n')
-        if len(ws) > 0
-    ]:
-      cmd_args = ['new', name]
+    raw_ws_out = self.execute_command('workspace', 'list').out
+    # the current workspace is marked with a leading '*'
+    exists = any(ws.strip().lstrip('*').strip() == name
+                 for ws in raw_ws_out.splitlines())
+    cmd_args = ['select' if exists else 'new', name]
     return self.execute_command('workspace', *cmd_args).out
 
   @_cache
   def plan(self, input=False, color=False, refresh=True, tf_vars=None,
            targets=None, output=False, tf_var_file=None, state=None,
-           use_cache=False, **kw):
+           use_cache=False, raw=False, **kw):
     """
     Run Terraform plan command, optionally returning parsed plan output.
 
@@ -633,6 +1175,7 @@ class TerraformTest(object):
       output: Determines if output will be returned.
       tf_var_file: Path to terraform variable configuration file relative to `self.tfdir`.
       state: Path to state file to use when reading the prior state snapshot.
+      raw: Return the decoded plan JSON instead of a TerraformPlanOutput.
     """
     cmd_args = parse_args(input=input, color=color, refresh=refresh,
                           tf_vars=tf_vars, targets=targets,
@@ -645,14 +1188,32 @@ class TerraformTest(object):
     # of the .terragrunt-cache, then plan / show would work, otherwise it overwrites each other!
     temp_file = fp.name if len(self._tg_ra()) == 0 else os.path.basename(
         fp.name)
-    cmd_args.append('-out={}'.format(temp_file))
-    self.execute_command('plan', *cmd_args)
-    result = self.execute_command('show', '-no-color', '-json', temp_file)
+    cmd_args.append(f'-out={temp_file}')
     try:
-      return self._plan_formatter(result.out)
-    except json.JSONDecodeError as e:
-      raise TerraformTestError(
-          'Error decoding plan output: {}'.format(e))
+      self.execute_command('plan', *cmd_args)
+      result = self.execute_command('show', '-no-color', '-json', temp_file,
+                                    decode=False)
+    finally:
+      # the binary plan is only needed by show, run-all plans live in the
+      # .terragrunt-cache folders and are removed with them
+      if temp_file == fp.name:
+        try:
+          os.unlink(temp_file)
+        except FileNotFoundError:
+          pass
+    if not self._tg_ra() and (not result.out or result.out.isspace()):
+      raise TerraformTestError('Error decoding plan output: empty output')
+    if not raw:
+      formatter = self._plan_formatter
+    elif self._tg_ra():
+      formatter = partial(_parse_run_all_out, formatter=dict)
+    else:
+      formatter = _json_loads
+    try:
+      return formatter(result.out)
+    except ValueError as e:
+      raise TerraformTestError('Error decoding plan output: {}; head={!r}'.format(
+          e, result.out[:256]))
 
   @_cache
   def apply(self, input=False, color=False, auto_approve=True, tf_vars=None,
@@ -678,17 +1239,22 @@ class TerraformTest(object):
   def output(self, name=None, color=False, json_format=True, use_cache=False,
              **kw):
     """Run Terraform output command."""
-    cmd_args = []
-    if name:
-      cmd_args.append(name)
-    cmd_args += parse_args(color=color, json_format=json_format, **kw)
-    output = self.execute_command('output', *cmd_args).out
+    cmd_args = [name] if name else []
+    if kw:
+      cmd_args += parse_args(color=color, json_format=json_format, **kw)
+    else:
+      # skip generic argument parsing for the common case
+      cmd_args += [flag for flag, enabled in (
+          ('-no-color', color is False), ('-json', json_format is True)) if enabled]
+    output = self.execute_command('output', *cmd_args,
+                                  decode=not json_format).out
     _LOGGER.debug('output %s', output)
     if json_format:
       try:
         output = self._output_formatter(output)
-      except json.JSONDecodeError as e:
+      except ValueError as e:
         _LOGGER.warning('error decoding output: {}'.format(e))
+        output = _decode(output)
     return output
 
   @_cache
@@ -708,45 +1274,120 @@ class TerraformTest(object):
 
   def state_pull(self):
     """Pull state."""
-    state = self.execute_command('state', 'pull')
+    state = self.execute_command('state', 'pull', decode=False)
     try:
-      state = TerraformState(json.loads(state.out))
-    except json.JSONDecodeError as e:
+      state = TerraformState(_json_loads(state.out))
+    except ValueError as e:
       _LOGGER.warning('error decoding state: {}'.format(e))
+      state = state._replace(out=_decode(state.out))
     return state
 
-  def execute_command(self, cmd, *cmd_args):
-    """Run arbitrary Terraform command."""
-    _LOGGER.debug([cmd, cmd_args])
+  def state_from_backend(self, bucket, prefix=None, workspace='default'):
+    """Read state directly from a GCS backend bucket, bypassing Terraform.
+
+    Requires the google-cloud-storage package. Falls back to state_pull if the
+    state object does not exist.
+
+    Args:
+      bucket: the backend bucket name.
+      prefix: the backend prefix, if any.
+      workspace: the workspace whose state is read.
+    """
+    try:
+      from google.api_core.exceptions import NotFound
+      from google.cloud import storage
+    except ImportError as e:
+      raise TerraformTestError(
+          'google-cloud-storage is required to read backend state: %s' % e)
+    name = f'{workspace}.tfstate'
+    if prefix:
+      name = f'{prefix.rstrip("/")}/{name}'
+    blob = storage.Client().bucket(bucket).blob(name)
+    try:
+      raw = blob.download_as_bytes()
+    except NotFound:
+      _LOGGER.warning('state object gs://%s/%s not found', bucket, name)
+      return self.state_pull()
+    return TerraformState(_json_loads(raw))
+
+  def output_from_state(self, name=None):
+    """Read outputs from pulled state instead of running the output command.
+
+    Falls back to the output command for run-all, or if state cannot be
+    pulled or decoded. Outside of run-all, both paths return the value of the
+    named output, or a TerraformValueDict of all outputs.
+    """
+    if self._tg_ra():
+      return self.output(name)
+    try:
+      state = self.state_pull()
+    except TerraformTestError as e:
+      _LOGGER.warning('error pulling state: {}'.format(e))
+      state = None
+    outputs = state.outputs if isinstance(state, TerraformState) else \
+        self.output()
+    return outputs[name] if name else outputs
+
+  def execute_command(self, cmd, *cmd_args, decode=True):
+    """Run arbitrary Terraform command.
+
+    Args:
+      cmd: the Terraform command to run.
+      *cmd_args: command arguments.
+      decode: decode stdout to str, set to False to get raw bytes for direct
+        use with a JSON parser.
+    """
+    _LOGGER.debug('cmd=%s args=%s', cmd, cmd_args)
+    cmdline = [self.binary, *self._tg_ra(), cmd]
+    cmdline += cmd_args
+    _LOGGER.info('cmdline=%s', cmdline)
+    log_output = _LOGGER.isEnabledFor(logging.INFO)
+    try:
+      p = subprocess.Popen(cmdline, cwd=self.tfdir,
+                           env=self._env_override, **_POPEN_KW)
+    except FileNotFoundError as e:
+      raise TerraformTestError('Terraform executable not found: %s' % e)
+    with p:
+      full_output, err = _read_output(p, log_output)
+      retcode = p.wait()
+    return self._command_output(cmd, retcode, full_output, err, decode)
+
+  async def execute_command_async(self, cmd, *cmd_args, decode=True):
+    """Run arbitrary Terraform command as an asyncio subprocess.
+
+    Lets many commands run concurrently from a single event loop, eg via
+    asyncio.gather. Arguments are the same as for execute_command.
+    """
+    # asyncio is only imported here as it dominates this module's import time
+    import asyncio
+    _LOGGER.debug('cmd=%s args=%s', cmd, cmd_args)
     cmdline = [self.binary, *self._tg_ra(), cmd]
     cmdline += cmd_args
-    _LOGGER.info(cmdline)
-    retcode = None
-    full_output_lines = []
+    _LOGGER.info('cmdline=%s', cmdline)
     try:
-      stderr_mode = subprocess.STDOUT if os.name == 'nt' else subprocess.PIPE
-      p = subprocess.Popen(cmdline, stdout=subprocess.PIPE, stderr=stderr_mode,
-                           cwd=self.tfdir, env=self.env,
-                           universal_newlines=True, encoding='utf-8',
-                           errors='ignore')
-      while True:
-        output = p.stdout.readline()
-        if output == '' and p.poll() is not None:
-          break
-        if output:
-          _LOGGER.info(output.strip())
-          full_output_lines.append(output)
-      retcode = p.poll()
-      p.wait()
+      p = await asyncio.create_subprocess_exec(
+          *cmdline, cwd=self.tfdir, env=self._env_override, **_POPEN_KW)
     except FileNotFoundError as e:
       raise TerraformTestError('Terraform executable not found: %s' % e)
-    out, err = p.communicate()
-    full_output = "".join(full_output_lines)
+    full_output, err = await p.communicate()
+    if _LOGGER.isEnabledFor(logging.INFO):
+      for line in full_output.splitlines():
+        _LOGGER.info(_decode(line).strip())
+    return self._command_output(cmd, p.returncode, full_output, err, decode)
+
+  def _command_output(self, cmd, retcode, full_output, err, decode):
+    """Check the return code and wrap the output of a finished command."""
+    _LOGGER.debug('read %s bytes', len(full_output))
+    err = _decode(err) if err is not None else err
     if retcode in [1, 11]:
       message = 'Error running command {command}: {retcode} {out} {err}'.format(
-          command=cmd, retcode=retcode, out=full_output, err=err)
+          command=cmd, retcode=retcode, out=_decode(full_output), err=err)
       _LOGGER.critical(message)
       raise TerraformTestError(message, err)
+    if decode:
+      full_output = _decode(full_output)
+    elif isinstance(full_output, bytearray):
+      full_output = bytes(full_output)
     return TerraformCommandOutput(retcode, full_output, err)
 
   def _tg_ra(self) -> List[str]:
@@ -758,7 +1399,7 @@ class TerraformTest(object):
     return self.binary.endswith('terragrunt')
 
 
-def _parse_run_all_out(output: str, formatter: TerraformJSONBase) -> str:
+def _parse_run_all_out(output: str, formatter: TerraformJSONBase) -> List:
   """
     run-all output a bunch of jsons back to back in one string(no comma),
     this convert the output to a valid json (put b2b jsons into a list)
@@ -766,16 +1407,27 @@ def _parse_run_all_out(output: str, formatter: TerraformJSONBase) -> str:
     output: the back to back jsons in a string
     formatter: output format, could be TerraformValueDict or TerraformPlanOutput
   Returns:
-    convert the input into a list that is a valid json
+    list of formatted objects, one per JSON document in the output
   """
-  dicts = json.loads("[" + re.sub(r"\}\s*\{", "}, {", output) + "]")
-  return [formatter(d) for d in dicts]
+  if isinstance(output, (bytes, bytearray)):
+    output = _decode(output)
+  # decode documents in place instead of rewriting the whole output into a
+  # single JSON list, which also leaves braces inside strings untouched
+  results = []
+  pos, end = 0, len(output)
+  while True:
+    pos = _WHITESPACE_RE.match(output, pos).end()
+    if pos == end:
+      return results
+    raw, pos = _JSON_DECODER.raw_decode(output, pos)
+    results.append(formatter(raw))
 
 
 class TerragruntTest(TerraformTest):
 
   def __init__(self, tfdir, basedir=None, binary='terragrunt', env=None,
-               tg_run_all=False, enable_cache=False, cache_dir=None):
+               tg_run_all=False, enable_cache=False, cache_dir=None,
+               plugin_cache_dir=None):
     """A helper class that could be used for testing terragrunt
 
     Most operations that apply to :func:`~TerraformTest` also apply to this class.
@@ -795,9 +1447,11 @@ class TerragruntTest(TerraformTest):
       enable_cache: Determines if the caching enabled for specific methods
       cache_dir: optional base directory to use for caching, defaults to
         the directory of the python file that instantiates this class
+      plugin_cache_dir: optional provider plugin cache directory shared across
+        instances, either absolute or relative to basedir
     """
     TerraformTest.__init__(self, tfdir, basedir, binary, env, enable_cache,
-                           cache_dir)
+                           cache_dir, plugin_cache_dir)
     self.tg_run_all = tg_run_all
     if self.tg_run_all:
       self._plan_formatter = partial(_parse_run_all_out,